@@ -1,280 +1,464 @@
-import json
-from typing import List, Dict, Any
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
+import ijson
+from typing import List, Dict, Any, Callable, Iterable, Iterator, NamedTuple
+from operator import itemgetter
+import io
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+from string import ascii_uppercase
+from xml.sax.saxutils import escape
 
-class OS:
-    def __init__(self, name: str, version: str):
-        self.name = name
-        self.version = version
+# Maximum column width (900px ~ 100 chars)
+MAX_COLUMN_WIDTH = 100
+
+# Display values for boolean flags, indexed by the flag itself
+YESNO = ("No", "Yes")
+
+# Cell formats, indexes into cellXfs of STYLES_XML
+HEADER_STYLE = 1
+BODY_STYLE = 2
+
+# Shared string index of a text cell written by _row_xml or a generated render_row
+SHARED_STRING_REF = re.compile(r'( t="s"><v>)(\d+)')
+
+# Control characters XML 1.0 does not allow, written in Excel's _xHHHH_ escape form instead
+ILLEGAL_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+# Literal text that Excel would otherwise decode as an _xHHHH_ escape
+EXCEL_ESCAPE = re.compile('_x[0-9A-Fa-f]{4}_')
+
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+PACKAGE_REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+CONTENT_TYPE_PREFIX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.'
+
+ROOT_RELS_XML = (
+    XML_DECLARATION +
+    f'<Relationships xmlns="{PACKAGE_REL_NS}">'
+    f'<Relationship Id="rId1" Type="{REL_NS}/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+STYLES_XML = (
+    XML_DECLARATION +
+    f'<styleSheet xmlns="{MAIN_NS}">'
+    '<fonts count="2">'
+    '<font><sz val="11"/><name val="Calibri"/><family val="2"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/><family val="2"/></font>'
+    '</fonts>'
+    '<fills count="2">'
+    '<fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill>'
+    '</fills>'
+    '<borders count="2">'
+    '<border><left/><right/><top/><bottom/><diagonal/></border>'
+    '<border><left style="thin"/><right style="thin"/><top style="thin"/><bottom style="thin"/><diagonal/></border>'
+    '</borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="3">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="1" xfId="0" applyFont="1" applyBorder="1" applyAlignment="1">'
+    '<alignment horizontal="center" vertical="center" wrapText="1"/></xf>'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="1" xfId="0" applyBorder="1" applyAlignment="1">'
+    '<alignment vertical="top" wrapText="1"/></xf>'
+    '</cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+# Records are immutable, so devices with the same OS, software or CVE list share one object
+_OS_CACHE: Dict[tuple, 'OS'] = {}
+_SOFTWARE_CACHE: Dict[tuple, 'Software'] = {}
+_CVE_CACHE: Dict[str, str] = {}
+
+class OS(NamedTuple):
+    name: str
+    version: str
+
+    _getter = itemgetter('name', 'version')
 
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'OS':
-        return cls(
-            name=data['name'],
-            version=data['version']
-        )
+        key = cls._getter(data)
+        record = _OS_CACHE.get(key)
+        if record is None:
+            record = _OS_CACHE[key] = cls(*key)
+        return record
+
+class Software(NamedTuple):
+    name: str
+    version: str
+    vendor: str
 
-class Software:
-    def __init__(self, name: str, version: str, vendor: str):
-        self.name = name
-        self.version = version
-        self.vendor = vendor
+    _getter = itemgetter('name', 'version', 'vendor')
 
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'Software':
-        return cls(
-            name=data['name'],
-            version=data['version'],
-            vendor=data['vendor']
-        )
+        key = cls._getter(data)
+        software = _SOFTWARE_CACHE.get(key)
+        if software is None:
+            software = _SOFTWARE_CACHE[key] = cls(*key)
+        return software
 
-class Vulnerability:
-    def __init__(self, 
-                 kaspersky_id: str, 
-                 product_name: str, 
-                 description_url: str, 
-                 recommended_major_patch: str, 
-                 recommended_minor_patch: str, 
-                 severity_str: str, 
-                 severity: int, 
-                 cve: List[str], 
-                 exploit_exists: bool, 
-                 malware_exists: bool):
-        self.kaspersky_id = kaspersky_id
-        self.product_name = product_name
-        self.description_url = description_url
-        self.recommended_major_patch = recommended_major_patch
-        self.recommended_minor_patch = recommended_minor_patch
-        self.severity_str = severity_str
-        self.severity = severity
-        self.cve = cve
-        self.exploit_exists = exploit_exists
-        self.malware_exists = malware_exists
+class Vulnerability(NamedTuple):
+    kaspersky_id: str
+    product_name: str
+    description_url: str
+    recommended_major_patch: str
+    recommended_minor_patch: str
+    severity_str: str
+    severity: int
+    exploit_exists: bool
+    malware_exists: bool
+    cve_str: str
+
+    # Keys of every field but cve_str, in field order
+    _getter = itemgetter(
+        'kasperskyID', 'productName', 'descriptionURL', 'recommendedMajorPatch',
+        'recommendedMinorPatch', 'severityStr', 'severity', 'exploitExists', 'malwareExists'
+    )
 
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'Vulnerability':
-        return cls(
-            kaspersky_id=data['kasperskyID'],
-            product_name=data['productName'],
-            description_url=data['descriptionURL'],
-            recommended_major_patch=data['recommendedMajorPatch'],
-            recommended_minor_patch=data['recommendedMinorPatch'],
-            severity_str=data['severityStr'],
-            severity=data['severity'],
-            cve=data['cve'],
-            exploit_exists=data['exploitExists'],
-            malware_exists=data['malwareExists']
-        )
+        cve_str = ", ".join(data['cve'])
+        return cls(*cls._getter(data), _CVE_CACHE.setdefault(cve_str, cve_str))
 
-class Device:
-    def __init__(self, 
-                 name: str, 
-                 fqdn: List[str], 
-                 ip_addresses: List[str], 
-                 mac_addresses: List[str], 
-                 owner: str, 
-                 os: OS, 
-                 software: List[Software], 
-                 vulnerabilities: List[Vulnerability]):
-        self.name = name
-        self.fqdn = fqdn
-        self.ip_addresses = ip_addresses
-        self.mac_addresses = mac_addresses
-        self.owner = owner
-        self.os = os
-        self.software = software
-        self.vulnerabilities = vulnerabilities
+class Device(NamedTuple):
+    name: str
+    fqdn_str: str
+    ip_str: str
+    mac_str: str
+    owner: str
+    os: OS
+    software: List[Software]
+    vulnerabilities: List[Vulnerability]
 
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'Device':
         return cls(
             name=data['name'],
-            fqdn=data['fqdn'],
-            ip_addresses=data['ipAddresses'],
-            mac_addresses=data['macAddresses'],
+            fqdn_str=", ".join(data['fqdn']),
+            ip_str=", ".join(data['ipAddresses']),
+            mac_str=", ".join(data['macAddresses']),
             owner=data['owner'],
             os=OS.from_dict(data['os']),
-            software=[Software.from_dict(item) for item in data['software']],
-            vulnerabilities=[Vulnerability.from_dict(item) for item in data['vulnerabilities']]
+            software=list(map(Software.from_dict, data['software'])),
+            vulnerabilities=list(map(Vulnerability.from_dict, data['vulnerabilities']))
         )
 
-def save_to_excel(devices: List[Device], output_file: str):
-    wb = Workbook()
-    
-    # Remove default sheet
-    if 'Sheet' in wb.sheetnames:
-        wb.remove(wb['Sheet'])
-    
-    # Create worksheets
-    devices_ws = wb.create_sheet("Device")
-    software_ws = wb.create_sheet("Software")
-    vulnerabilities_ws = wb.create_sheet("Vulnerability")
-    
-    # Format styles
-    header_font = Font(bold=True)
-    center_alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-    wrap_alignment = Alignment(wrap_text=True, vertical='top')
-    thin_border = Border(left=Side(style='thin'), 
-                        right=Side(style='thin'), 
-                        top=Side(style='thin'), 
-                        bottom=Side(style='thin'))
-    
-    # Write Devices sheet
+def _starts_with_list(f) -> bool:
+    # Peeks at the first non-whitespace byte, so ijson can still read the file itself
+    while True:
+        chunk = f.read(4096)
+        if not chunk:
+            return False
+        chunk = chunk.lstrip()
+        if chunk:
+            return chunk[:1] == b'['
+
+def iter_devices(input_file: str) -> Iterator[Device]:
+    # Streams the top-level JSON list one device at a time
+    with open(input_file, 'rb') as f:
+        if not _starts_with_list(f):
+            raise ijson.JSONError("expected a top-level list of devices")
+        f.seek(0)
+
+        for item in ijson.items(f, 'item', use_float=True):
+            yield Device.from_dict(item)
+
+def _device_rows(devices: Iterable[Device]):
+    for device in devices:
+        yield [
+            device.name,
+            device.fqdn_str,
+            device.ip_str,
+            device.mac_str,
+            device.owner,
+            device.os.name,
+            device.os.version
+        ]
+
+def _software_rows(devices: Iterable[Device]):
+    for device in devices:
+        if not device.software:
+            yield [device.name, None, None, None]
+            continue
+
+        for software in device.software:
+            yield [
+                device.name,
+                software.name,
+                software.version,
+                software.vendor
+            ]
+
+def _vulnerability_rows(devices: Iterable[Device]):
+    for device in devices:
+        if not device.vulnerabilities:
+            yield [device.name] + [None] * 10
+            continue
+
+        for vuln in device.vulnerabilities:
+            yield [
+                device.name,
+                vuln.kaspersky_id,
+                vuln.product_name,
+                vuln.severity,
+                vuln.severity_str,
+                vuln.cve_str,
+                YESNO[bool(vuln.exploit_exists)],
+                YESNO[bool(vuln.malware_exists)],
+                vuln.recommended_major_patch,
+                vuln.recommended_minor_patch,
+                vuln.description_url
+            ]
+
+def _row_xml(row_num: int, values, style: int, shared_strings: Dict[str, int]) -> str:
+    cells = []
+    for letter, value in zip(ascii_uppercase, values):
+        if value is None or value == "":
+            cells.append(f'<c r="{letter}{row_num}" s="{style}"/>')
+        elif isinstance(value, str):
+            index = shared_strings.setdefault(value, len(shared_strings))
+            cells.append(f'<c r="{letter}{row_num}" s="{style}" t="s"><v>{index}</v></c>')
+        elif isinstance(value, bool):
+            cells.append(f'<c r="{letter}{row_num}" s="{style}" t="b"><v>{int(value)}</v></c>')
+        else:
+            cells.append(f'<c r="{letter}{row_num}" s="{style}"><v>{value}</v></c>')
+    return f'<row r="{row_num}">{"".join(cells)}</row>\n'
+
+# Source templates for the generated body row renderer, filled in per column by _compile_row_renderer
+TEXT_CELL_BODY = """\
+        if len(v{col}) > max_lengths[{col}]:
+            max_lengths[{col}] = len(v{col})
+        lines = v{col}.count("\\n") + 1
+        if lines > max_lines:
+            max_lines = lines
+        c{col} = f'<c r="{letter}{{row_num}}" s="{style}" t="s"><v>{{index(v{col}, len(shared_strings))}}</v></c>'
+"""
+
+NUMBER_CELL_BODY = """\
+        if len(str(v{col})) > max_lengths[{col}]:
+            max_lengths[{col}] = len(str(v{col}))
+        c{col} = f'<c r="{letter}{{row_num}}" s="{style}"><v>{{v{col}}}</v></c>'
+"""
+
+BOOL_CELL_BODY = """\
+        if len(str(v{col})) > max_lengths[{col}]:
+            max_lengths[{col}] = len(str(v{col}))
+        c{col} = f'<c r="{letter}{{row_num}}" s="{style}" t="b"><v>{{int(v{col})}}</v></c>'
+"""
+
+BLANK_CELL_BODY = """\
+        c{col} = f'<c r="{letter}{{row_num}}" s="{style}"/>'
+"""
+
+# Both column kinds accept any value like _row_xml does; they only differ in which branch is tested first
+TEXT_CELL_SOURCE = (
+    '\n    if isinstance(v{col}, str) and v{col}:\n' + TEXT_CELL_BODY +
+    '    elif v{col} is None or v{col} == "":\n' + BLANK_CELL_BODY +
+    '    elif isinstance(v{col}, bool):\n' + BOOL_CELL_BODY +
+    '    else:\n' + NUMBER_CELL_BODY
+)
+
+NUMBER_CELL_SOURCE = (
+    '\n    if v{col} is None or v{col} == "":\n' + BLANK_CELL_BODY +
+    '    elif isinstance(v{col}, str):\n' + TEXT_CELL_BODY +
+    '    elif isinstance(v{col}, bool):\n' + BOOL_CELL_BODY +
+    '    else:\n' + NUMBER_CELL_BODY
+)
+
+ROW_SOURCE = """
+def render_row(row_num, values, shared_strings, max_lengths):
+    {names}, = values
+    index = shared_strings.setdefault
+    max_lines = 1
+{cells}
+    if max_lines > 1:
+        return f'<row r="{{row_num}}" ht="{{15 * max_lines}}" customHeight="1">{joined}</row>\\n'
+    return f'<row r="{{row_num}}">{joined}</row>\\n'
+"""
+
+def _compile_row_renderer(column_count: int, numeric_columns) -> Callable:
+    # Generates a row renderer specialised to the sheet: the loop over columns is unrolled and each
+    # column's letter, style and expected cell type are baked in as constants
+    cells = "".join(
+        (NUMBER_CELL_SOURCE if col in numeric_columns else TEXT_CELL_SOURCE).format(
+            col=col, letter=letter, style=BODY_STYLE
+        )
+        for col, letter in zip(range(column_count), ascii_uppercase)
+    )
+    source = ROW_SOURCE.format(
+        names=", ".join(f"v{col}" for col in range(column_count)),
+        cells=cells,
+        joined="".join(f"{{c{col}}}" for col in range(column_count))
+    )
+    namespace = {}
+    exec(compile(source, '<render_row>', 'exec'), namespace)
+    return namespace['render_row']
+
+def _render_sheet(headers: List[str], build_rows, numeric_columns, input_file: str, rows_path: str):
+    # Runs in a worker process, so strings are indexed into a table local to this sheet
+    shared_strings = {}
+    render_row = _compile_row_renderer(len(headers), numeric_columns)
+
+    # <cols> has to precede <sheetData>, so rows are buffered until the widths are known
+    max_lengths = [len(header) for header in headers]
+    row_count = 0
+    with open(rows_path, 'w', encoding='utf-8') as rows:
+        rows.write(_row_xml(1, headers, HEADER_STYLE, shared_strings))
+        for row_num, values in enumerate(build_rows(iter_devices(input_file)), 2):
+            rows.write(render_row(row_num, values, shared_strings, max_lengths))
+            row_count += 1
+
+    # Column widths with maximum limit
+    cols = "".join(
+        f'<col min="{col}" max="{col}" width="{min((length + 2) * 1.2, MAX_COLUMN_WIDTH):g}" customWidth="1"/>'
+        for col, length in enumerate(max_lengths, 1)
+    )
+    return cols, list(shared_strings), row_count
+
+def _write_sheet(zf: zipfile.ZipFile, path: str, rows_path: str, cols: str, string_indexes: List[int]):
+    # string_indexes maps each sheet-local string index to its index in the workbook table
+    def remap(match):
+        return f'{match.group(1)}{string_indexes[int(match.group(2))]}'
+
+    with open(rows_path, 'r', encoding='utf-8') as rows, \
+            zf.open(path, 'w', force_zip64=True) as part, io.TextIOWrapper(part, encoding='utf-8') as out:
+        out.write(f'{XML_DECLARATION}<worksheet xmlns="{MAIN_NS}"><cols>{cols}</cols><sheetData>')
+        if string_indexes == list(range(len(string_indexes))):
+            shutil.copyfileobj(rows, out)
+        else:
+            for row in rows:
+                out.write(SHARED_STRING_REF.sub(remap, row))
+        out.write('</sheetData></worksheet>')
+
+def _write_workbook(zf: zipfile.ZipFile, sheet_names: List[str]):
+    sheet_ids = range(1, len(sheet_names) + 1)
+    styles_id = len(sheet_names) + 1
+    shared_strings_id = len(sheet_names) + 2
+
+    content_types = "".join(
+        f'<Override PartName="/xl/worksheets/sheet{sheet_id}.xml" ContentType="{CONTENT_TYPE_PREFIX}worksheet+xml"/>'
+        for sheet_id in sheet_ids
+    )
+    zf.writestr('[Content_Types].xml', (
+        XML_DECLARATION +
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        f'<Override PartName="/xl/workbook.xml" ContentType="{CONTENT_TYPE_PREFIX}sheet.main+xml"/>'
+        f'<Override PartName="/xl/styles.xml" ContentType="{CONTENT_TYPE_PREFIX}styles+xml"/>'
+        f'<Override PartName="/xl/sharedStrings.xml" ContentType="{CONTENT_TYPE_PREFIX}sharedStrings+xml"/>'
+        f'{content_types}</Types>'
+    ))
+    zf.writestr('_rels/.rels', ROOT_RELS_XML)
+
+    sheets = "".join(
+        f'<sheet name="{escape(name)}" sheetId="{sheet_id}" r:id="rId{sheet_id}"/>'
+        for sheet_id, name in zip(sheet_ids, sheet_names)
+    )
+    zf.writestr('xl/workbook.xml', (
+        XML_DECLARATION +
+        f'<workbook xmlns="{MAIN_NS}" xmlns:r="{REL_NS}"><sheets>{sheets}</sheets></workbook>'
+    ))
+
+    relationships = "".join(
+        f'<Relationship Id="rId{sheet_id}" Type="{REL_NS}/worksheet" Target="worksheets/sheet{sheet_id}.xml"/>'
+        for sheet_id in sheet_ids
+    )
+    zf.writestr('xl/_rels/workbook.xml.rels', (
+        XML_DECLARATION +
+        f'<Relationships xmlns="{PACKAGE_REL_NS}">{relationships}'
+        f'<Relationship Id="rId{styles_id}" Type="{REL_NS}/styles" Target="styles.xml"/>'
+        f'<Relationship Id="rId{shared_strings_id}" Type="{REL_NS}/sharedStrings" Target="sharedStrings.xml"/>'
+        '</Relationships>'
+    ))
+    zf.writestr('xl/styles.xml', STYLES_XML)
+
+def _escape_text(text: str) -> str:
+    # Protect existing _xHHHH_ sequences by escaping their underscore first, as xlsxwriter does
+    text = EXCEL_ESCAPE.sub(lambda match: f'_x005F{match.group()}', text)
+    return ILLEGAL_XML_CHARS.sub(lambda match: f'_x{ord(match.group()):04X}_', escape(text))
+
+def _write_shared_strings(zf: zipfile.ZipFile, shared_strings: Dict[str, int]):
+    # Dicts keep insertion order, which matches the indexes handed out in save_to_excel
+    with zf.open('xl/sharedStrings.xml', 'w', force_zip64=True) as part, \
+            io.TextIOWrapper(part, encoding='utf-8') as out:
+        out.write(f'{XML_DECLARATION}<sst xmlns="{MAIN_NS}" uniqueCount="{len(shared_strings)}">')
+        for text in shared_strings:
+            if text[0].isspace() or text[-1].isspace():
+                out.write(f'<si><t xml:space="preserve">{_escape_text(text)}</t></si>')
+            else:
+                out.write(f'<si><t>{_escape_text(text)}</t></si>')
+        out.write('</sst>')
+
+def save_to_excel(input_file: str, output_file: str) -> int:
+    # Devices sheet
     devices_headers = [
         "Name", "FQDN", "IP Addresses", "MAC Addresses", "Owner", "OS Name", "OS Version"
     ]
-    for col_num, header in enumerate(devices_headers, 1):
-        cell = devices_ws.cell(row=1, column=col_num, value=header)
-        cell.font = header_font
-        cell.alignment = center_alignment
-        cell.border = thin_border
-    
-    for row_num, device in enumerate(devices, 2):
-        devices_ws.cell(row=row_num, column=1, value=device.name).alignment = wrap_alignment
-        devices_ws.cell(row=row_num, column=2, value=", ".join(device.fqdn)).alignment = wrap_alignment
-        devices_ws.cell(row=row_num, column=3, value=", ".join(device.ip_addresses)).alignment = wrap_alignment
-        devices_ws.cell(row=row_num, column=4, value=", ".join(device.mac_addresses)).alignment = wrap_alignment
-        devices_ws.cell(row=row_num, column=5, value=device.owner).alignment = wrap_alignment
-        devices_ws.cell(row=row_num, column=6, value=device.os.name).alignment = wrap_alignment
-        devices_ws.cell(row=row_num, column=7, value=device.os.version).alignment = wrap_alignment
-        
-        # Apply borders
-        for col in range(1, 8):
-            devices_ws.cell(row=row_num, column=col).border = thin_border
     
-    # Write Software sheet with grouping by device name
+    # Software sheet with grouping by device name
     software_headers = [
-        "��", "Software Name", "������", "������"
+        "Устройство", "Software Name", "Версия", "Вендор"
     ]
-    for col_num, header in enumerate(software_headers, 1):
-        cell = software_ws.cell(row=1, column=col_num, value=header)
-        cell.font = header_font
-        cell.alignment = center_alignment
-        cell.border = thin_border
     
-    row_num = 2
-    for device in devices:
-        start_row = row_num
-        if not device.software:
-            software_ws.cell(row=row_num, column=1, value=device.name).alignment = wrap_alignment
-            for col in range(1, 5):
-                software_ws.cell(row=row_num, column=col).border = thin_border
-            row_num += 1
-            continue
-            
-        for software in device.software:
-            software_ws.cell(row=row_num, column=1, value=device.name if row_num == start_row else "").alignment = wrap_alignment
-            software_ws.cell(row=row_num, column=2, value=software.name).alignment = wrap_alignment
-            software_ws.cell(row=row_num, column=3, value=software.version).alignment = wrap_alignment
-            software_ws.cell(row=row_num, column=4, value=software.vendor).alignment = wrap_alignment
-            
-            # Apply borders
-            for col in range(1, 5):
-                software_ws.cell(row=row_num, column=col).border = thin_border
-            
-            row_num += 1
-        
-        # Merge device name cells
-        if row_num > start_row + 1:
-            software_ws.merge_cells(start_row=start_row, start_column=1, end_row=row_num-1, end_column=1)
-    
-    # Write Vulnerabilities sheet with grouping by device name
+    # Vulnerabilities sheet with grouping by device name
     vuln_headers = [
-        "��", "Kaspersky ID", "Product Name", "Severity", 
+        "Устройство", "Kaspersky ID", "Product Name", "Severity", 
         "Severity Level", "CVE IDs", "Exploit Exists", "Malware Exists",
         "Recommended Major Patch", "Recommended Minor Patch", "Description URL"
     ]
-    for col_num, header in enumerate(vuln_headers, 1):
-        cell = vulnerabilities_ws.cell(row=1, column=col_num, value=header)
-        cell.font = header_font
-        cell.alignment = center_alignment
-        cell.border = thin_border
     
-    row_num = 2
-    for device in devices:
-        start_row = row_num
-        if not device.vulnerabilities:
-            vulnerabilities_ws.cell(row=row_num, column=1, value=device.name).alignment = wrap_alignment
-            for col in range(1, 12):
-                vulnerabilities_ws.cell(row=row_num, column=col).border = thin_border
-            row_num += 1
-            continue
-            
-        for vuln in device.vulnerabilities:
-            vulnerabilities_ws.cell(row=row_num, column=1, value=device.name if row_num == start_row else "").alignment = wrap_alignment
-            vulnerabilities_ws.cell(row=row_num, column=2, value=vuln.kaspersky_id).alignment = wrap_alignment
-            vulnerabilities_ws.cell(row=row_num, column=3, value=vuln.product_name).alignment = wrap_alignment
-            vulnerabilities_ws.cell(row=row_num, column=4, value=vuln.severity).alignment = wrap_alignment
-            vulnerabilities_ws.cell(row=row_num, column=5, value=vuln.severity_str).alignment = wrap_alignment
-            vulnerabilities_ws.cell(row=row_num, column=6, value=", ".join(vuln.cve)).alignment = wrap_alignment
-            vulnerabilities_ws.cell(row=row_num, column=7, value="Yes" if vuln.exploit_exists else "No").alignment = wrap_alignment
-            vulnerabilities_ws.cell(row=row_num, column=8, value="Yes" if vuln.malware_exists else "No").alignment = wrap_alignment
-            vulnerabilities_ws.cell(row=row_num, column=9, value=vuln.recommended_major_patch).alignment = wrap_alignment
-            vulnerabilities_ws.cell(row=row_num, column=10, value=vuln.recommended_minor_patch).alignment = wrap_alignment
-            vulnerabilities_ws.cell(row=row_num, column=11, value=vuln.description_url).alignment = wrap_alignment
-            
-            # Apply borders
-            for col in range(1, 12):
-                vulnerabilities_ws.cell(row=row_num, column=col).border = thin_border
-            
-            row_num += 1
-        
-        # Merge device name cells
-        if row_num > start_row + 1:
-            vulnerabilities_ws.merge_cells(start_row=start_row, start_column=1, end_row=row_num-1, end_column=1)
-    
-    # Auto-adjust column widths with maximum limit (900px ~ 100 chars)
-    MAX_COLUMN_WIDTH = 100
+    # Name, headers, row builder and the columns holding numbers rather than text
+    sheets = [
+        ("Device", devices_headers, _device_rows, ()),
+        ("Software", software_headers, _software_rows, ()),
+        ("Vulnerability", vuln_headers, _vulnerability_rows, (3,))
+    ]
     
-    for sheet in wb.sheetnames:
-        ws = wb[sheet]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        rows_paths = [os.path.join(tmp_dir, f'sheet{sheet_id}.xml') for sheet_id in range(1, len(sheets) + 1)]
         
-        # Adjust column widths with maximum limit
-        for col in ws.columns:
-            max_length = 0
-            column = col[0].column_letter
-            for cell in col:
-                try:
-                    if cell.value and len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            
-            # Calculate width with limit
-            adjusted_width = min((max_length + 2) * 1.2, MAX_COLUMN_WIDTH)
-            ws.column_dimensions[column].width = adjusted_width
+        # The sheets don't depend on each other, so each one is rendered in its own process
+        # that streams the devices from input_file itself
+        with multiprocessing.Pool(len(sheets)) as pool:
+            rendered = pool.starmap(_render_sheet, [
+                (headers, build_rows, numeric_columns, input_file, rows_path)
+                for (_, headers, build_rows, numeric_columns), rows_path in zip(sheets, rows_paths)
+            ])
         
-        # Adjust row heights for wrapped text
-        for row in ws.iter_rows():
-            max_lines = 1
-            for cell in row:
-                if cell.value and "\n" in str(cell.value):
-                    lines = len(str(cell.value).split("\n"))
-                    if lines > max_lines:
-                        max_lines = lines
-            if max_lines > 1:
-                ws.row_dimensions[row[0].row].height = 15 * max_lines
+        # Every distinct string is stored once and referenced by index from all sheets
+        shared_strings = {}
+        with zipfile.ZipFile(output_file, 'w', zipfile.ZIP_DEFLATED) as zf:
+            _write_workbook(zf, [name for name, _, _, _ in sheets])
+            for sheet_id, (rows_path, (cols, strings, _)) in enumerate(zip(rows_paths, rendered), 1):
+                string_indexes = [shared_strings.setdefault(text, len(shared_strings)) for text in strings]
+                _write_sheet(zf, f'xl/worksheets/sheet{sheet_id}.xml', rows_path, cols, string_indexes)
+            _write_shared_strings(zf, shared_strings)
     
-    # Save the workbook
-    wb.save(output_file)
     print(f"Data successfully saved to {output_file}")
+    
+    # The Device sheet has exactly one row per device
+    _, _, device_count = rendered[0]
+    return device_count
 
 def main():
     try:
-        with open('response.json', 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        device_count = save_to_excel('response.json', "devices_grouped_rows.xlsx")
     except FileNotFoundError:
         print("Error: File 'response.json' not found.")
         return
-    except json.JSONDecodeError:
+    except ijson.JSONError:
         print("Error: Invalid JSON format in 'response.json'.")
         return
     
-    devices = [Device.from_dict(item) for item in data]
-    save_to_excel(devices, "devices_grouped_rows.xlsx")
-    print(f"Processed {len(devices)} devices. Results saved to devices_grouped_rows.xlsx")
+    print(f"Processed {device_count} devices. Results saved to devices_grouped_rows.xlsx")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,90 @@
+import json
+import zipfile
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from new_parse_assets import MAIN_NS, save_to_excel
+
+NS = {'m': MAIN_NS}
+
+
+def _device(**overrides):
+    device = {
+        "name": "host1",
+        "fqdn": ["host1.corp"],
+        "ipAddresses": ["10.0.0.1"],
+        "macAddresses": ["aa:bb"],
+        "owner": "admin",
+        "os": {"name": "Windows 10", "version": "22H2"},
+        "software": [{"name": "App", "version": "1.0", "vendor": "Vendor"}],
+        "vulnerabilities": [{
+            "kasperskyID": "KLA1",
+            "productName": "Prod",
+            "descriptionURL": "https://example.com",
+            "recommendedMajorPatch": "",
+            "recommendedMinorPatch": "KB1",
+            "severityStr": "High",
+            "severity": 3,
+            "cve": ["CVE-1"],
+            "exploitExists": True,
+            "malwareExists": False
+        }]
+    }
+    device.update(overrides)
+    return device
+
+
+def _save(tmp_path, devices):
+    input_file = tmp_path / "response.json"
+    input_file.write_text(json.dumps(devices), encoding='utf-8')
+    output_file = tmp_path / "out.xlsx"
+    save_to_excel(str(input_file), str(output_file))
+    return output_file
+
+
+def _cell(output_file, sheet_id, ref):
+    with zipfile.ZipFile(output_file) as zf:
+        # Every part has to be well-formed XML for Excel to open the workbook
+        for name in zf.namelist():
+            ET.fromstring(zf.read(name))
+        sheet = ET.fromstring(zf.read(f'xl/worksheets/sheet{sheet_id}.xml'))
+    return sheet.find(f'.//m:c[@r="{ref}"]', NS)
+
+
+def test_boolean_values_are_written_as_boolean_cells(tmp_path):
+    devices = [_device(owner=True), _device(name="host2", owner=False)]
+    devices[0]["vulnerabilities"][0]["severity"] = False
+    output_file = _save(tmp_path, devices)
+
+    # Device sheet goes through the generated text column path
+    owner = _cell(output_file, 1, "E2")
+    assert owner.get("t") == "b"
+    assert owner.find('m:v', NS).text == "1"
+    assert _cell(output_file, 1, "E3").find('m:v', NS).text == "0"
+
+    # Severity goes through the generated numeric column path
+    severity = _cell(output_file, 3, "D2")
+    assert severity.get("t") == "b"
+    assert severity.find('m:v', NS).text == "0"
+
+
+def test_boolean_values_round_trip_through_openpyxl(tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    devices = [_device(owner=True)]
+    devices[0]["vulnerabilities"][0]["severity"] = False
+    output_file = _save(tmp_path, devices)
+
+    wb = openpyxl.load_workbook(output_file)
+    assert wb["Device"]["E2"].value is True
+    assert wb["Vulnerability"]["D2"].value is False
+    assert wb["Vulnerability"]["G2"].value == "Yes"
+
+
+def test_excel_escapes_in_text_are_protected(tmp_path):
+    output_file = _save(tmp_path, [_device(name="a_x0041_b\x01")])
+
+    with zipfile.ZipFile(output_file) as zf:
+        shared_strings = ET.fromstring(zf.read('xl/sharedStrings.xml'))
+    texts = [t.text for t in shared_strings.iterfind('m:si/m:t', NS)]
+    assert "a_x005F_x0041_b_x0001_" in texts